@@ -1,6 +1,7 @@
 # core/google_api.py
 from __future__ import annotations
-import requests
+from datetime import timedelta
+from functools import lru_cache
 from typing import Dict, Optional
 from allauth.socialaccount.models import SocialApp, SocialToken, SocialAccount
 from django.conf import settings
@@ -9,11 +10,44 @@ from django.utils.timezone import now
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
 DRIVE_ABOUT_URL = "https://www.googleapis.com/drive/v3/about?fields=storageQuota"
 
+def __getattr__(name):
+    # PEP 562: importing this module stays cheap for manage.py commands
+    # that never talk to Google; requests (and its urllib3 stack) only
+    # loads on first use.
+    if name == "requests":
+        import requests
+        globals()["requests"] = requests
+        return requests
+    raise AttributeError(name)
+
+@lru_cache(maxsize=1)
+def _session():
+    # One shared Session so every call reuses the warm TLS connection to
+    # googleapis.com instead of paying a fresh handshake per request.
+    import requests
+    session = requests.Session()
+    session.mount(
+        "https://",
+        requests.adapters.HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=requests.adapters.Retry(
+                total=2, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504)
+            ),
+        ),
+    )
+    return session
+
 class GoogleAPIError(Exception):
     pass
 
+@lru_cache(maxsize=1)
 def _get_social_app() -> SocialApp:
-    # Use the Sites framework to find the active SocialApp
+    # Use the Sites framework to find the active SocialApp. The app's
+    # client_id/secret essentially never change at runtime, so cache the
+    # row per process instead of querying on every refresh. A failed
+    # lookup isn't cached, so configuring the app in admin takes effect
+    # without a restart.
     app = SocialApp.objects.filter(provider="google", sites__id=settings.SITE_ID).first()
     if not app:
         raise GoogleAPIError("Google SocialApp not configured in admin.")
@@ -35,7 +69,7 @@ def _refresh_access_token(token_obj: SocialToken) -> SocialToken:
         "grant_type": "refresh_token",
         "refresh_token": refresh_token,
     }
-    resp = requests.post(GOOGLE_TOKEN_URL, data=data, timeout=20)
+    resp = _session().post(GOOGLE_TOKEN_URL, data=data, timeout=20)
     if resp.status_code != 200:
         raise GoogleAPIError(f"Failed to refresh token: {resp.status_code} {resp.text}")
 
@@ -52,15 +86,14 @@ def _refresh_access_token(token_obj: SocialToken) -> SocialToken:
     if new_refresh:
         token_obj.token_secret = new_refresh
     if expires_in:
-        # allauth’s SocialToken has expires_at; saving None is okay too
-        token_obj.expires_at = now() + settings.timedelta(seconds=int(expires_in)) if hasattr(settings, "timedelta") else token_obj.expires_at
-        # we don’t strictly need to compute expires_at; access token will work until 401 anyway
-    token_obj.save()
+        # Record the expiry so callers can skip refreshing still-valid tokens
+        token_obj.expires_at = now() + timedelta(seconds=int(expires_in))
+    token_obj.save(update_fields=["token", "token_secret", "expires_at"])
     return token_obj
 
 def _authorized_get(access_token: str, url: str) -> requests.Response:
     headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.get(url, headers=headers, timeout=20)
+    return _session().get(url, headers=headers, timeout=20)
 
 def get_storage_quota(sa: SocialAccount) -> Optional[Dict[str, str]]:
     """
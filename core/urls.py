@@ -2,15 +2,6 @@
 from django.urls import path
 from . import views
 
-urlpatterns = [
-    path("", views.home, name="home"),
-    path("register/", views.register, name="register"),
-    path("profile/", views.profile, name="profile"),
-]
-# core/urls.py
-from django.urls import path
-from . import views
-
 urlpatterns = [
     path("", views.home, name="home"),
     path("register/", views.register, name="register"),
@@ -1,16 +1,29 @@
 ﻿# core/views.py
 from __future__ import annotations
 
-from django.conf import settings
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
 from django.contrib import messages
 from django.contrib.auth import login as auth_login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.timezone import now
 
 # allauth
 from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
 
+from .google_api import (
+    DRIVE_ABOUT_URL,
+    GoogleAPIError,
+    _authorized_get,
+    _get_social_app,
+    _refresh_access_token,
+)
+
 # Optional local SignUpForm; we’ll fallback to Django’s UserCreationForm if missing
 try:
     from .forms import SignUpForm  # type: ignore
@@ -23,92 +36,26 @@ except Exception:
 def _site_has_google_app() -> bool:
     """Return True if a Google SocialApp is attached to this SITE_ID."""
     try:
-        return SocialApp.objects.filter(
-            provider="google",
-            sites__id=getattr(settings, "SITE_ID", 1),
-        ).exists()
+        _get_social_app()  # cached per process
+        return True
+    except GoogleAPIError:
+        return False
     except Exception:
         return SocialApp.objects.filter(provider="google").exists()
 
 
+@functools.lru_cache(maxsize=256)
 def _humanize_bytes(n: int | None) -> str:
     if n is None:
         return "unlimited"
-    units = ["B", "KB", "MB", "GB", "TB", "PB"]
-    n = float(n)
-    i = 0
-    while n >= 1024 and i < len(units) - 1:
-        n /= 1024.0
-        i += 1
-    return f"{n:.1f} {units[i]}" if i else f"{int(n)} {units[i]}"
-
-
-def _build_drive_quota_for_account(acc: SocialAccount) -> tuple[dict | None, str | None]:
-    """
-    Given a SocialAccount (Google), return (quota_dict, error_message).
-    quota: {"usage","limit","remaining"} (humanized strings)
-    """
-    # Lazy-import Google libs so manage.py check won't crash if deps not installed
-    try:
-        from google.oauth2.credentials import Credentials
-        from googleapiclient.discovery import build
-        from google.auth.transport.requests import Request
-    except Exception:
-        return None, (
-            "Google API client not installed. "
-            "Run: pip install google-api-python-client google-auth google-auth-httplib2 google-auth-oauthlib"
-        )
-
-    tok = (
-        SocialToken.objects
-        .filter(account=acc)
-        .order_by("-id")
-        .first()
-    )
-    if not tok:
-        return None, "No OAuth token stored for this account."
-
-    try:
-        app = SocialApp.objects.get(provider="google")
-        client_id, client_secret = app.client_id, app.secret
-    except SocialApp.DoesNotExist:
-        return None, "Google SocialApp not configured for this site."
-
-    try:
-        # allauth stores refresh_token in token_secret for OAuth2
-        creds = Credentials(
-            token=tok.token,
-            refresh_token=tok.token_secret,
-            client_id=client_id,
-            client_secret=client_secret,
-            token_uri="https://oauth2.googleapis.com/token",
-            scopes=[
-                "https://www.googleapis.com/auth/drive.metadata.readonly",
-                "openid", "email", "profile",
-            ],
-        )
-
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            if creds.token and creds.token != tok.token:
-                tok.token = creds.token
-                tok.save(update_fields=["token"])
-
-        service = build("drive", "v3", credentials=creds)
-        about = service.about().get(fields="storageQuota").execute()
-        sq = about.get("storageQuota", {})
-        usage = int(sq.get("usage", 0))
-        limit = int(sq.get("limit", 0)) or None
-        remaining = (limit - usage) if limit else None
-
-        quota = {
-            "usage": _humanize_bytes(usage),
-            "limit": _humanize_bytes(limit) if limit else "unlimited",
-            "remaining": _humanize_bytes(remaining) if remaining is not None else None,
-        }
-        return quota, None
-    except Exception as e:
-        return None, str(e)
+    n = int(n)
+    if n <= 0:
+        return "0 B"
+    units = ("B", "KB", "MB", "GB", "TB", "PB")
+    # Pick the unit straight from the bit length instead of dividing in a
+    # loop: 2**10 per unit step, capped at PB.
+    i = min((n.bit_length() - 1) // 10, len(units) - 1)
+    return f"{n} B" if i == 0 else f"{n / (1 << (i * 10)):.1f} {units[i]}"
 
 
 # ---------- Views ----------
@@ -119,26 +66,6 @@ def home(request):
     return render(request, "home.html", context)
 
 
-@login_required
-def dashboard(request):
-    """
-    Build the `items` list your dashboard template expects:
-      items = [{ "account": SocialAccount, "quota": {...} | None, "error": str | None }]
-    """
-    accounts = (
-        SocialAccount.objects
-        .filter(user=request.user, provider="google")
-        .select_related("user")
-    )
-
-    items = []
-    for acc in accounts:
-        quota, error = _build_drive_quota_for_account(acc)
-        items.append({"account": acc, "quota": quota, "error": error})
-
-    return render(request, "dashboard.html", {"items": items})
-
-
 @login_required
 def disconnect_google(request, pk: int):
     """Remove a linked Google account from the current user."""
@@ -184,64 +111,95 @@ def profile(request):
     return render(request, "profile.html", {})
 
 
-# --- keep all your existing imports + helpers as-is ---
+# ---------- Drive quota ----------
+
+# Drive quota caching: storage totals move on the order of minutes, so a
+# short TTL avoids hammering the Drive API on every page load.
+_QUOTA_CACHE_TTL = 300   # seconds an entry stays servable at all
+_QUOTA_FRESH_FOR = 60    # seconds an entry is served without re-fetching
+_QUOTA_REFRESH_POOL = ThreadPoolExecutor(max_workers=2)
 
-def _build_drive_quota_for_account(acc: SocialAccount) -> tuple[dict | None, str | None]:
+
+def _build_drive_quota_for_account(acc: SocialAccount, tok: SocialToken | None) -> tuple[dict | None, str | None]:
     """
-    Given a SocialAccount (Google), return (quota_dict, error_message).
+    Given a SocialAccount (Google) and its newest SocialToken (pre-fetched
+    by the caller so the fan-out doesn't run one query per account),
+    return (quota_dict, error_message).
 
     quota (humanized): {"usage","limit","remaining"}
     quota_raw (bytes): {"usage","limit","remaining"}  (limit/remaining may be None for unlimited)
-    """
-    # Lazy-import Google libs so manage.py check won't crash if deps not installed
-    try:
-        from google.oauth2.credentials import Credentials
-        from googleapiclient.discovery import build
-        from google.auth.transport.requests import Request
-    except Exception:
-        return None, (
-            "Google API client not installed. "
-            "Run: pip install google-api-python-client google-auth google-auth-httplib2 google-auth-oauthlib"
-        )
 
-    tok = (
-        SocialToken.objects
-        .filter(account=acc)
-        .order_by("-id")
-        .first()
-    )
+    Results are cached per (account, token) with a stale-while-revalidate
+    policy: fresh entries are returned as-is; stale-but-present entries are
+    returned immediately while a background refresh runs; only a cold cache
+    pays the Drive API round-trip on the request path.
+    """
     if not tok:
         return None, "No OAuth token stored for this account."
 
+    # An expired access token with no refresh token can never succeed;
+    # skip the doomed HTTPS call instead of failing deep in the fetch.
+    if not tok.token_secret and (tok.expires_at is None or tok.expires_at < now()):
+        return None, "Token expired; re-link this Google account."
+
+    key = f"drive-quota:{acc.id}:{tok.id}"
+    entry = cache.get(key)
+    if entry is not None:
+        # Expired-but-refreshable token: renew it in the background so a
+        # later fetch doesn't pay the 401 + token-refresh round-trip while
+        # we serve the cached quota now.
+        if tok.token_secret and tok.expires_at is not None and tok.expires_at < now():
+            _schedule_token_refresh(tok)
+        if time.time() - entry["at"] > _QUOTA_FRESH_FOR:
+            # Single-flight guard: the cache only gets rewritten on a
+            # successful fetch, so while Google is erroring every request
+            # would otherwise enqueue another refresh for the same entry.
+            if cache.add(f"quota-refresh:{key}", 1, _QUOTA_FRESH_FOR):
+                _QUOTA_REFRESH_POOL.submit(_refresh_drive_quota, key, acc, tok)
+        return entry["quota"], entry["error"]
+
+    return _refresh_drive_quota(key, acc, tok)
+
+
+def _schedule_token_refresh(tok: SocialToken) -> None:
+    """Refresh a token in the background, at most once per token per minute.
+
+    The cache.add guard keeps concurrent requests from stampeding the
+    token endpoint for the same token.
+    """
+    if cache.add(f"token-refresh:{tok.id}", 1, 60):
+        _QUOTA_REFRESH_POOL.submit(_refresh_token_quietly, tok)
+
+
+def _refresh_token_quietly(tok: SocialToken) -> None:
     try:
-        app = SocialApp.objects.get(provider="google")
-        client_id, client_secret = app.client_id, app.secret
-    except SocialApp.DoesNotExist:
-        return None, "Google SocialApp not configured for this site."
+        _refresh_access_token(tok)
+    except Exception:
+        # Next fetch falls back to the synchronous 401 path.
+        pass
+
 
+def _refresh_drive_quota(key: str, acc: SocialAccount, tok: SocialToken) -> tuple[dict | None, str | None]:
+    """Fetch the quota from Google and (on success) write it to the cache."""
+    quota, error = _fetch_drive_quota(acc, tok)
+    if error is None:
+        cache.set(key, {"quota": quota, "error": error, "at": time.time()}, _QUOTA_CACHE_TTL)
+    return quota, error
+
+
+def _fetch_drive_quota(acc: SocialAccount, tok: SocialToken) -> tuple[dict | None, str | None]:
+    """Uncached Drive `about.get` call for one account's newest token."""
     try:
-        # allauth stores refresh_token in token_secret for OAuth2
-        creds = Credentials(
-            token=tok.token,
-            refresh_token=tok.token_secret,
-            client_id=client_id,
-            client_secret=client_secret,
-            token_uri="https://oauth2.googleapis.com/token",
-            scopes=[
-                "https://www.googleapis.com/auth/drive.metadata.readonly",
-                "openid", "email", "profile",
-            ],
-        )
-
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            if creds.token and creds.token != tok.token:
-                tok.token = creds.token
-                tok.save(update_fields=["token"])
-
-        service = build("drive", "v3", credentials=creds)
-        about = service.about().get(fields="storageQuota").execute()
-        sq = about.get("storageQuota", {})
+        # One authorized GET; on 401, refresh via allauth's stored refresh
+        # token (token_secret) and retry once.
+        resp = _authorized_get(tok.token, DRIVE_ABOUT_URL)
+        if resp.status_code == 401:
+            tok = _refresh_access_token(tok)
+            resp = _authorized_get(tok.token, DRIVE_ABOUT_URL)
+        if resp.status_code != 200:
+            return None, f"Drive API error: {resp.status_code} {resp.text}"
+
+        sq = resp.json().get("storageQuota", {})
 
         usage_b = int(sq.get("usage", 0))
         limit_b = int(sq.get("limit", 0)) or None  # None ⇒ unlimited
@@ -264,43 +222,62 @@ def _build_drive_quota_for_account(acc: SocialAccount) -> tuple[dict | None, str
         return None, str(e)
 
 
+def _totals(items: list[dict]) -> tuple[int, int | None]:
+    """
+    Sum the raw byte counts across accounts in one pass.
+
+    Returns (used_bytes, limit_bytes). limit_bytes is None (⇒ unlimited)
+    when any readable account is unlimited or no account was readable;
+    unreadable accounts are skipped entirely.
+    """
+    raws = [r for r in ((it["quota"] or {}).get("quota_raw") for it in items) if r]
+    used = sum(r["usage"] for r in raws)
+    limits = [r["limit"] for r in raws]
+    all_finite = bool(limits) and all(l is not None for l in limits)
+    return used, (sum(limits) if all_finite else None)
+
+
 @login_required
 def dashboard(request):
     """
     Build the `items` list your dashboard template expects and also compute
     the cross-account totals for the big donut.
     """
-    accounts = (
+    # The template only touches acc.pk and acc.extra_data; skip hydrating
+    # the rest of the row (and the whole User join).
+    accounts = list(
         SocialAccount.objects
         .filter(user=request.user, provider="google")
-        .select_related("user")
+        .only("id", "uid", "extra_data")
     )
 
+    # One query for all tokens instead of one per account; newest token
+    # per account wins thanks to the -id ordering.
+    tokens: dict[int, SocialToken] = {}
+    for t in (
+        SocialToken.objects
+        .filter(account__in=accounts)
+        .only("id", "token", "token_secret", "expires_at", "account")
+        .order_by("-id")
+    ):
+        tokens.setdefault(t.account_id, t)
+
+    # Each account needs a blocking round-trip to Google; run them in
+    # parallel so total latency is ~max(call) instead of sum(calls).
+    # ex.map preserves the account ordering.
     items = []
-    for acc in accounts:
-        quota, error = _build_drive_quota_for_account(acc)
-        items.append({"account": acc, "quota": quota, "error": error})
+    if accounts:
+        with ThreadPoolExecutor(max_workers=min(len(accounts), 8)) as ex:
+            results = list(ex.map(
+                _build_drive_quota_for_account,
+                accounts,
+                (tokens.get(acc.id) for acc in accounts),
+            ))
+        for acc, (quota, error) in zip(accounts, results):
+            items.append({"account": acc, "quota": quota, "error": error})
 
     # ---- Aggregate totals across accounts ----
-    # Sum used; sum limits only if *all* are finite. If any unlimited, overall is unlimited.
-    used_sum = 0
-    all_finite = True
-    limit_sum = 0
-
-    for it in items:
-        q = (it.get("quota") or {}).get("quota_raw")
-        if not q:
-            # If we can't read this account, skip it for totals
-            continue
-        used_sum += int(q.get("usage") or 0)
-        limit_v = q.get("limit")
-        if limit_v is None:
-            all_finite = False
-        else:
-            limit_sum += int(limit_v)
-
-    total_limit_b = limit_sum if (items and all_finite) else None
-    total_used_b = used_sum
+    total_used_b, total_limit_b = _totals(items)
     total_avail_b = (total_limit_b - total_used_b) if total_limit_b is not None else None
 
     total = {